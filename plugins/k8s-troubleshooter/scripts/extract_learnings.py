@@ -4,16 +4,45 @@ Extract learnings from k8s troubleshooting sessions and update the knowledge bas
 This script analyzes completed sessions and identifies patterns, solutions, and best practices.
 """
 
+import os
 import sys
-import yaml
 import json
 import re
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from datetime import datetime
-from collections import defaultdict
-from typing import Dict, List, Tuple
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Tuple
+
+# Below this many sessions the pool startup cost outweighs the speedup
+MIN_SESSIONS_FOR_POOL = 4
 
 class SessionLearningExtractor:
+    # Precompiled metadata patterns (compiled once instead of per session)
+    _DATE_RE = re.compile(r'Date:\s+(.+)')
+    _JIRA_RE = re.compile(r'Jira Ticket:\s+(.+)')
+    _NS_RE = re.compile(r'Affected Namespaces:\s+(.+)')
+
+    # Splits the report into sections on '## ' headings in one pass
+    _HEADING_SPLIT_RE = re.compile(r'\n##\s+')
+
+    # Pulls bullet items out of a section in one multiline pass
+    _BULLET_RE = re.compile(r'^\s*-\s*(.+?)\s*$', re.MULTILINE)
+
+    # All category keywords as one alternation so categorization is a single
+    # C-level scan instead of one substring search per keyword. Longest
+    # alternatives first so e.g. 'crashloop' wins over 'crash'
+    _CATEGORY_KEYWORDS = (
+        'oom', 'out of memory', 'memory limit', 'crashloop', 'crash',
+        'image', 'pull', 'not found', 'pending', 'scheduling',
+        'network', 'dns', 'connection', 'argocd', 'sync',
+        'tekton', 'pipeline', 'crossplane', 'storage', 'pvc', 'volume',
+        'permission', 'rbac', 'forbidden'
+    )
+    _KEYWORD_RE = re.compile(
+        '|'.join(sorted(map(re.escape, _CATEGORY_KEYWORDS), key=len, reverse=True))
+    )
+
     def __init__(self, session_dir: Path):
         self.session_dir = session_dir
         self.patterns = defaultdict(list)
@@ -24,6 +53,7 @@ class SessionLearningExtractor:
         learning = {
             'date': None,
             'jira_ticket': None,
+            'category': 'Configuration Issues',
             'problem_description': None,
             'investigation': None,
             'root_cause': None,
@@ -34,85 +64,111 @@ class SessionLearningExtractor:
             'namespaces': []
         }
 
-        # Parse summary file for metadata
-        if summary_file.exists():
-            with open(summary_file) as f:
+        # Parse learning report first if it exists (this is the rich
+        # content!); the summary file is only read afterwards for whatever
+        # metadata the report did not supply
+        if learning_report and learning_report.exists():
+            with open(learning_report) as f:
                 content = f.read()
 
-            # Extract metadata
-            if match := re.search(r'Date:\s+(.+)', content):
+            # Metadata headers may be present in the report itself
+            if match := self._DATE_RE.search(content):
                 learning['date'] = match.group(1).strip()
-            if match := re.search(r'Jira Ticket:\s+(.+)', content):
+            if match := self._JIRA_RE.search(content):
                 learning['jira_ticket'] = match.group(1).strip()
-            if match := re.search(r'Affected Namespaces:\s+(.+)', content):
+            if match := self._NS_RE.search(content):
                 learning['namespaces'] = match.group(1).strip().split()
 
-        # Parse learning report if it exists (this is the rich content!)
-        if learning_report and learning_report.exists():
-            with open(learning_report) as f:
+            # Split the report once and look up each section in O(1)
+            sections = self._split_sections(content)
+            learning['problem_description'] = sections.get('Problem Description')
+            learning['investigation'] = sections.get('Investigation')
+            learning['root_cause'] = sections.get('Root Cause')
+            learning['solution'] = sections.get('Solution')
+            learning['prevention'] = sections.get('Prevention')
+
+            # Extract resources modified and key learnings (bullet lists)
+            learning['resources_modified'] = self._BULLET_RE.findall(
+                sections.get('Resources Modified') or '')
+            learning['key_learnings'] = self._BULLET_RE.findall(
+                sections.get('Key Learnings') or '')
+
+            # Categorize on the full text, then truncate the display fields
+            # to their render caps so the in-memory learnings and the KB
+            # writer never carry or re-slice multi-KB section bodies
+            learning['category'] = self._categorize_problem(learning)
+            learning['problem_description'] = self._truncate(learning['problem_description'], 200)
+            learning['root_cause'] = self._truncate(learning['root_cause'], 150)
+            learning['solution'] = self._truncate(learning['solution'], 150)
+
+        # Fall back to the summary file only for metadata the report lacked
+        needs_summary = (learning['date'] is None
+                         or learning['jira_ticket'] is None
+                         or not learning['namespaces'])
+        if needs_summary and summary_file.exists():
+            with open(summary_file) as f:
                 content = f.read()
 
-            # Extract structured sections
-            learning['problem_description'] = self._extract_section(content, 'Problem Description')
-            learning['investigation'] = self._extract_section(content, 'Investigation')
-            learning['root_cause'] = self._extract_section(content, 'Root Cause')
-            learning['solution'] = self._extract_section(content, 'Solution')
-            learning['prevention'] = self._extract_section(content, 'Prevention')
-
-            # Extract resources modified (bullet list)
-            resources_section = self._extract_section(content, 'Resources Modified')
-            if resources_section:
-                learning['resources_modified'] = [
-                    line.strip('- ').strip()
-                    for line in resources_section.split('\n')
-                    if line.strip().startswith('-')
-                ]
-
-            # Extract key learnings (bullet list)
-            learnings_section = self._extract_section(content, 'Key Learnings')
-            if learnings_section:
-                learning['key_learnings'] = [
-                    line.strip('- ').strip()
-                    for line in learnings_section.split('\n')
-                    if line.strip().startswith('-')
-                ]
+            if learning['date'] is None and (match := self._DATE_RE.search(content)):
+                learning['date'] = match.group(1).strip()
+            if learning['jira_ticket'] is None and (match := self._JIRA_RE.search(content)):
+                learning['jira_ticket'] = match.group(1).strip()
+            if not learning['namespaces'] and (match := self._NS_RE.search(content)):
+                learning['namespaces'] = match.group(1).strip().split()
 
         return learning
 
-    def _extract_section(self, content: str, section_name: str) -> str:
-        """Extract a section from the learning report markdown."""
-        pattern = rf'##\s+{re.escape(section_name)}\s*\n(.+?)(?=\n##|\Z)'
-        match = re.search(pattern, content, re.DOTALL)
-        if match:
-            return match.group(1).strip()
-        return None
+    @staticmethod
+    def _truncate(text: str, limit: int) -> Optional[Tuple[str, bool]]:
+        """Cap text at limit chars, returning (text, was_truncated) or None."""
+        if not text:
+            return None
+        return (text[:limit], len(text) > limit)
+
+    def _split_sections(self, content: str) -> Dict[str, str]:
+        """Split the learning report markdown into {heading: body} in one pass."""
+        sections = {}
+        # Leading newline lets a report that starts with '## ' split cleanly
+        for part in self._HEADING_SPLIT_RE.split('\n' + content)[1:]:
+            heading, _, body = part.partition('\n')
+            sections[heading.strip()] = body.strip()
+        return sections
     
     def _categorize_problem(self, learning: Dict) -> str:
         """Categorize the problem type based on description and root cause."""
-        problem_desc = (learning.get('problem_description') or '').lower()
-        root_cause = (learning.get('root_cause') or '').lower()
-        combined = problem_desc + ' ' + root_cause
-
-        # Pattern matching on problem description
-        if 'oom' in combined or 'out of memory' in combined or 'memory limit' in combined:
+        problem_desc = learning.get('problem_description')
+        root_cause = learning.get('root_cause')
+        # Summary-only sessions have neither field; skip the keyword scan
+        if not problem_desc and not root_cause:
+            return 'Configuration Issues'
+        # Lowercase once over the combined text instead of per field
+        combined = f"{problem_desc or ''} {root_cause or ''}".lower()
+
+        # Collect every keyword in one linear scan, then apply the category
+        # rules against the found set instead of re-scanning per keyword
+        found = set(self._KEYWORD_RE.findall(combined))
+        if 'crashloop' in found:
+            found.add('crash')  # 'crash' is a substring of the longer match
+
+        if found & {'oom', 'out of memory', 'memory limit'}:
             return 'Memory / OOM Issues'
-        elif 'crashloop' in combined or 'crash' in combined:
+        elif 'crash' in found:
             return 'Pod CrashLoopBackOff'
-        elif 'image' in combined and ('pull' in combined or 'not found' in combined):
+        elif 'image' in found and found & {'pull', 'not found'}:
             return 'Image Pull Errors'
-        elif 'pending' in combined or 'scheduling' in combined:
+        elif found & {'pending', 'scheduling'}:
             return 'Pod Scheduling Issues'
-        elif 'network' in combined or 'dns' in combined or 'connection' in combined:
+        elif found & {'network', 'dns', 'connection'}:
             return 'Network / DNS Issues'
-        elif 'argocd' in combined or 'sync' in combined:
+        elif found & {'argocd', 'sync'}:
             return 'ArgoCD Sync Issues'
-        elif 'tekton' in combined or 'pipeline' in combined:
+        elif found & {'tekton', 'pipeline'}:
             return 'Tekton Pipeline Issues'
-        elif 'crossplane' in combined:
+        elif 'crossplane' in found:
             return 'Crossplane Issues'
-        elif 'storage' in combined or 'pvc' in combined or 'volume' in combined:
+        elif found & {'storage', 'pvc', 'volume'}:
             return 'Storage / PVC Issues'
-        elif 'permission' in combined or 'rbac' in combined or 'forbidden' in combined:
+        elif found & {'permission', 'rbac', 'forbidden'}:
             return 'RBAC / Permission Issues'
 
         return 'Configuration Issues'
@@ -121,29 +177,34 @@ class SessionLearningExtractor:
         """Extract common patterns from multiple sessions."""
         patterns = {
             'problem_categories': defaultdict(list),
-            'namespace_patterns': defaultdict(int),
-            'all_learnings': []
+            'namespace_patterns': Counter(),
+            # dict keys give O(1) dedup on insert while keeping insertion order
+            'all_learnings': {}
         }
 
         for learning in learnings:
-            # Categorize this problem
-            category = self._categorize_problem(learning)
+            # Category was computed against the full text during analysis
+            category = learning.get('category', 'Configuration Issues')
 
             # Group learnings by category
             patterns['problem_categories'][category].append(learning)
 
             # Track namespace patterns
-            for ns in learning.get('namespaces', []):
-                patterns['namespace_patterns'][ns] += 1
+            patterns['namespace_patterns'].update(learning.get('namespaces', []))
 
-            # Collect all key learnings
-            patterns['all_learnings'].extend(learning.get('key_learnings', []))
+            # Collect all key learnings, deduplicated as they arrive
+            for item in learning.get('key_learnings', []):
+                patterns['all_learnings'].setdefault(item, None)
 
         return patterns
     
-    def generate_knowledge_base_update(self, patterns: Dict, learnings: List[Dict]) -> str:
-        """Generate markdown content for knowledge base update."""
-        md = f"""# K8s Troubleshooting Knowledge Base
+    def iter_knowledge_base_update(self, patterns: Dict, learnings: List[Dict]):
+        """Yield markdown fragments for the knowledge base update.
+
+        Generating lazily keeps peak memory flat regardless of output size;
+        the caller streams the fragments straight to disk.
+        """
+        yield f"""# K8s Troubleshooting Knowledge Base
 Last Updated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
 
 ## Session Statistics
@@ -153,78 +214,87 @@ Total Sessions Analyzed: {len(learnings)}
 ## Problem Categories and Solutions
 
 """
-        # Add each problem category with its solutions
-        for category, category_learnings in sorted(patterns['problem_categories'].items(),
-                                                   key=lambda x: len(x[1]), reverse=True):
-            md += f"### {category}\n\n"
-            md += f"**Occurrences:** {len(category_learnings)} session(s)\n\n"
+        # Add each problem category with its solutions, largest first;
+        # lengths are computed once rather than per sort comparison
+        categories_by_size = sorted(
+            [(len(cl), category, cl) for category, cl in patterns['problem_categories'].items()],
+            key=lambda t: t[0], reverse=True
+        )
+        for count, category, category_learnings in categories_by_size:
+            yield (f"### {category}\n\n")
+            yield (f"**Occurrences:** {count} session(s)\n\n")
 
             # Show each incident in this category
             for learning in category_learnings:
                 ticket = learning.get('jira_ticket', 'N/A')
                 if ticket and ticket != 'Not specified':
-                    md += f"#### {ticket}\n"
+                    yield (f"#### {ticket}\n")
                 else:
-                    md += f"#### Session from {learning.get('date', 'Unknown')}\n"
+                    yield (f"#### Session from {learning.get('date', 'Unknown')}\n")
 
                 # Problem description
                 if learning.get('problem_description'):
-                    md += f"\n**Problem:** {learning['problem_description'][:200]}"
-                    if len(learning['problem_description']) > 200:
-                        md += "..."
-                    md += "\n\n"
+                    text, truncated = learning['problem_description']
+                    yield (f"\n**Problem:** {text}")
+                    if truncated:
+                        yield ("...")
+                    yield ("\n\n")
 
                 # Root cause
                 if learning.get('root_cause'):
-                    md += f"**Root Cause:** {learning['root_cause'][:150]}"
-                    if len(learning['root_cause']) > 150:
-                        md += "..."
-                    md += "\n\n"
+                    text, truncated = learning['root_cause']
+                    yield (f"**Root Cause:** {text}")
+                    if truncated:
+                        yield ("...")
+                    yield ("\n\n")
 
                 # Solution summary
                 if learning.get('solution'):
-                    md += f"**Solution:** {learning['solution'][:150]}"
-                    if len(learning['solution']) > 150:
-                        md += "..."
-                    md += "\n\n"
+                    text, truncated = learning['solution']
+                    yield (f"**Solution:** {text}")
+                    if truncated:
+                        yield ("...")
+                    yield ("\n\n")
 
                 # Resources modified
                 if learning.get('resources_modified'):
-                    md += "**Resources Modified:**\n"
+                    yield ("**Resources Modified:**\n")
                     for resource in learning['resources_modified'][:3]:  # Limit to 3
-                        md += f"- {resource}\n"
-                    md += "\n"
+                        yield (f"- {resource}\n")
+                    yield ("\n")
 
-                md += "---\n\n"
+                yield ("---\n\n")
 
         # Add namespace insights
-        md += "## Namespace Activity Patterns\n\n"
+        yield ("## Namespace Activity Patterns\n\n")
         if patterns['namespace_patterns']:
-            for ns, count in sorted(patterns['namespace_patterns'].items(),
-                                   key=lambda x: x[1], reverse=True)[:10]:
-                md += f"- `{ns}`: {count} incident(s)\n"
+            for ns, count in patterns['namespace_patterns'].most_common(10):
+                yield (f"- `{ns}`: {count} incident(s)\n")
         else:
-            md += "*No namespace data available yet*\n"
+            yield ("*No namespace data available yet*\n")
 
         # Add aggregated key learnings
-        md += "\n## Key Learnings Across All Sessions\n\n"
+        yield ("\n## Key Learnings Across All Sessions\n\n")
         if patterns['all_learnings']:
-            # Deduplicate and show unique learnings
-            unique_learnings = list(set(patterns['all_learnings']))
-            for learning_item in unique_learnings[:20]:  # Top 20
-                md += f"- {learning_item}\n"
+            # Already unique; keys preserve first-seen order
+            for learning_item in list(patterns['all_learnings'])[:20]:  # Top 20
+                yield (f"- {learning_item}\n")
         else:
-            md += "*No learnings captured yet*\n"
-
-        md += "\n---\n\n"
-        md += "## How to Use This Knowledge Base\n\n"
-        md += "When troubleshooting similar issues:\n"
-        md += "1. Find your problem category above\n"
-        md += "2. Review past root causes and solutions\n"
-        md += "3. Apply similar fixes to your situation\n"
-        md += "4. Check namespace-specific patterns\n\n"
-
-        return md
+            yield ("*No learnings captured yet*\n")
+
+        yield ("\n---\n\n")
+        yield ("## How to Use This Knowledge Base\n\n")
+        yield ("When troubleshooting similar issues:\n")
+        yield ("1. Find your problem category above\n")
+        yield ("2. Review past root causes and solutions\n")
+        yield ("3. Apply similar fixes to your situation\n")
+        yield ("4. Check namespace-specific patterns\n\n")
+
+def _analyze_session_task(task: Tuple[Path, Path]) -> Dict:
+    """Module-level worker so tasks are picklable for the process pool."""
+    summary_file, learning_report = task
+    extractor = SessionLearningExtractor(summary_file.parent)
+    return extractor.analyze_session(summary_file, learning_report)
 
 def main():
     if len(sys.argv) < 2:
@@ -241,18 +311,25 @@ def main():
         sys.exit(1)
     
     extractor = SessionLearningExtractor(session_dir)
-    learnings = []
-
-    # Find all session summary files (both old and new locations)
-    summary_files = list(session_dir.glob('k8s-session-summary-*.txt'))
-
-    # Also check for session directories (both directly in session_dir and in k8s-troubleshooter subdir)
-    session_dirs = [d for d in session_dir.glob('*') if d.is_dir() and d.name.startswith('2')]
 
-    # Also check in k8s-troubleshooter subdirectory
-    k8s_troubleshooter_dir = session_dir / 'k8s-troubleshooter'
-    if k8s_troubleshooter_dir.exists():
-        session_dirs.extend([d for d in k8s_troubleshooter_dir.glob('*') if d.is_dir() and d.name.startswith('2')])
+    # Find all session summary files and session directories (both directly
+    # in session_dir and in the k8s-troubleshooter subdir) in a single
+    # scandir pass; DirEntry caches the file type so no extra stat calls
+    summary_files = []
+    session_dirs = []
+    with os.scandir(session_dir) as entries:
+        for entry in entries:
+            if entry.is_file():
+                if entry.name.startswith('k8s-session-summary-') and entry.name.endswith('.txt'):
+                    summary_files.append(Path(entry.path))
+            elif entry.is_dir():
+                if entry.name.startswith('2'):
+                    session_dirs.append(Path(entry.path))
+                elif entry.name == 'k8s-troubleshooter':
+                    with os.scandir(entry.path) as sub_entries:
+                        for sub_entry in sub_entries:
+                            if sub_entry.is_dir() and sub_entry.name.startswith('2'):
+                                session_dirs.append(Path(sub_entry.path))
 
     for session_subdir in session_dirs:
         summary_in_dir = session_subdir / 'k8s-session-summary.txt'
@@ -261,26 +338,41 @@ def main():
 
     print(f"Found {len(summary_files)} session summaries")
 
+    # Resolve old-format timestamps to session directories in one pass over
+    # session_dirs instead of rescanning the list for every summary
+    old_timestamps = {
+        f.name.replace('k8s-session-summary-', '').replace('.txt', '')
+        for f in summary_files if f.parent == session_dir
+    }
+    report_index = {}
+    for session_subdir in session_dirs:
+        for timestamp in old_timestamps:
+            if timestamp in session_subdir.name:
+                # First matching directory wins, as before
+                report_index.setdefault(timestamp, session_subdir / 'session-learning-report.md')
+
+    tasks = []
     for summary_file in summary_files:
         # Try to find corresponding learning report
-        learning_report = None
-
-        # Check if summary is in a session directory
         if summary_file.parent != session_dir:
             # It's in a subdirectory - look for learning report there
             learning_report = summary_file.parent / 'session-learning-report.md'
         else:
-            # Old format - try to match by timestamp
+            # Old format - look up the session directory by timestamp
             timestamp = summary_file.name.replace('k8s-session-summary-', '').replace('.txt', '')
-            # Look for session directory with this timestamp
-            for session_subdir in session_dirs:
-                if timestamp in session_subdir.name:
-                    learning_report = session_subdir / 'session-learning-report.md'
-                    break
+            learning_report = report_index.get(timestamp)
 
-        learning = extractor.analyze_session(summary_file, learning_report)
-        learnings.append(learning)
+        tasks.append((summary_file, learning_report))
 
+    # Parse sessions in parallel across cores; small batches run serially
+    # since pool startup would cost more than it saves
+    if len(tasks) >= MIN_SESSIONS_FOR_POOL:
+        with ProcessPoolExecutor() as executor:
+            learnings = list(executor.map(_analyze_session_task, tasks, chunksize=8))
+    else:
+        learnings = [_analyze_session_task(task) for task in tasks]
+
+    for summary_file, learning_report in tasks:
         if learning_report and learning_report.exists():
             print(f"✓ Analyzed: {summary_file.name} (with learning report)")
         else:
@@ -289,12 +381,10 @@ def main():
     # Extract patterns
     patterns = extractor.extract_patterns(learnings)
 
-    # Generate knowledge base
-    kb_content = extractor.generate_knowledge_base_update(patterns, learnings)
-
-    # Write output
-    with open(output_file, 'w') as f:
-        f.write(kb_content)
+    # Stream the knowledge base to disk as it is generated so peak memory
+    # stays flat no matter how large the output grows
+    with output_file.open('w', encoding='utf-8', buffering=1 << 20) as f:
+        f.writelines(extractor.iter_knowledge_base_update(patterns, learnings))
 
     print(f"\n✓ Knowledge base written to: {output_file}")
     print(f"  - Analyzed {len(learnings)} sessions")